@@ -28,6 +28,7 @@ setup(
     install_requires=['click'],
     extras_require={
         'test': ['pytest'],
+        'numpy': ['numpy'],
     },
     entry_points="""
       [console_scripts]
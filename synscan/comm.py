@@ -5,9 +5,11 @@
 
 import serial #MattC
 import socket
+import struct
 import logging
 import os
-import select
+import queue
+import selectors
 import threading
 import time
 
@@ -21,6 +23,33 @@ UDP_PORT = 0
 
 LOGGING_LEVEL=os.getenv("SYNSCAN_LOGGING_LEVEL",logging.INFO)
 
+_LOG=logging.getLogger(__name__)
+
+#HEX digits for every byte/nibble value. Used to build frames without string formatting
+_HEX2=tuple(f'{i:02X}'.encode() for i in range(256))
+_HEX1=tuple(f'{i:01X}'.encode() for i in range(16))
+
+#Frame layouts by number of data digits: ':' cmd axis [data hex digits] '\r'
+#Data goes as 2 digits fields, least significant byte first
+_FRAME_PACK_INTO={ndigits:struct.Struct('>BBB'+'2s'*(ndigits//2)+'1s'*(ndigits%2)+'B').pack_into
+                  for ndigits in (0,1,2,4,6)}
+
+#Position values are offseting by 0x800000 in both directions
+POSITION_OFFSET=0x800000
+#Commands sending a position (SetGotoTarget,SetGotoTargetIncrement,SetAxisPosition). As byte codes
+_POSITION_CMDS=frozenset(b'SHE')
+#Commands returning a position (Inquire Goto Target,Inquire Position). As byte codes
+_POSITION_REPLIES=frozenset(b'hj')
+#Set commands whose last sent value is remembered so redundant writes can be skipped
+#(SetMotionMode,SetStepPeriod,SetGotoTarget)
+_REMEMBERED_CMDS=frozenset('GIS')
+#Commands after which the motor may change those settings by itself
+#(StartMotion,AxisStop,Instant stop). StartMotion only for a goto: a tracking
+#axis keeps its settings until it is stopped
+_FORGETTING_CMDS=frozenset('JKL')
+#Motion mode bit for tracking (see motors.axis_set_motion_mode)
+_TRACKING_MODE=0x10
+
 class comm:
     '''
     UDP Comunication module.
@@ -36,28 +65,40 @@ class comm:
                 format='%(asctime)s %(levelname)s:synscanComm %(message)s',
                 level=LOGGING_LEVEL
                 )
-            logging.info(f"UDP target IP: {udp_ip}")
-            logging.info(f"UDP target port: {udp_port}")
+            _LOG.info("UDP target IP: %s",udp_ip)
+            _LOG.info("UDP target port: %s",udp_port)
             self._sock = serial.Serial(SERIAL_PORT, 9600, timeout=1)
             #self._sock.setblocking(0)
             self.udp_ip=udp_ip
             self.udp_port=udp_port
             self.commOK=False
-            self.lock= threading.Lock()
+            self.lock= threading.RLock()
         else:
             logging.basicConfig(
                 format='%(asctime)s %(levelname)s:synscanComm %(message)s',
                 level=LOGGING_LEVEL
                 )
-            logging.info(f"UDP target IP: {udp_ip}")
-            logging.info(f"UDP target port: {udp_port}")
+            _LOG.info("UDP target IP: %s",udp_ip)
+            _LOG.info("UDP target port: %s",udp_port)
             self._sock = socket.socket(socket.AF_INET, # Internet
             socket.SOCK_DGRAM) # UDP
             self._sock.setblocking(0)
+            self._selector = selectors.DefaultSelector()
+            self._selector.register(self._sock, selectors.EVENT_READ)
             self.udp_ip=udp_ip
             self.udp_port=udp_port
             self.commOK=False
-            self.lock= threading.Lock()
+            self.lock= threading.RLock()
+        self._addr=(self.udp_ip,self.udp_port)
+        #Reusable frame buffer for single commands. Longest frame is :CA123456\r
+        self._txBuf=bytearray(10)
+        self._txView=memoryview(self._txBuf)
+        #Last value successfully sent, or queued, by (cmd,axis). See _already_sent
+        self._lastSent={}
+        #Fire and forget commands are sent by a dedicated thread
+        self._txQueue = queue.Queue()
+        self._tx = threading.Thread(target=self._tx_loop,daemon=True)
+        self._tx.start()
 
     
     def _send_raw_cmd(self,cmd,timeout_in_seconds=2):
@@ -79,38 +120,190 @@ class comm:
                     # print("[")
                     # print(response)
                     # print("]")
-                    logging.debug(f"response: {response}" )
+                    _LOG.debug("response: %s",response)
                 else:
                     self.commOK=False
-                    logging.debug(f"Socket timeout. {timeout_in_seconds}s without response" )
+                    _LOG.debug("Socket timeout. %ss without response",timeout_in_seconds)
                     raise(NameError('SynscanSocketTimeoutError'))
                     response = False
         else:
             with self.lock:   
-                self._sock.sendto(cmd,(self.udp_ip,self.udp_port))
-                ready = select.select([self._sock], [], [], timeout_in_seconds)
-                if ready[0]:
-                    self.commOK=True
-                    response,(fromhost,fromport) = self._sock.recvfrom(1024)
-                    logging.debug(f"response: {response} host:{fromhost} port:{fromport}" )
-                else:
-                    self.commOK=False
-                    logging.debug(f"Socket timeout. {timeout_in_seconds}s without response" )
-                    raise(NameError('SynscanSocketTimeoutError'))
-                    response = False        
+                response = self._udp_exchange([cmd],timeout_in_seconds)[0]
         return response
 
+    def _udp_exchange(self,msgs,timeout_in_seconds=2):
+        '''Pipeline msgs over UDP: send all of them back to back, then collect
+        one reply per msg. Replies are returned in arrival order.
+        Caller must hold self.lock'''
+        #Discard late replies from previous timed out exchanges so they
+        #are not taken as answers to these msgs
+        while self._selector.select(0):
+            stale,(fromhost,fromport) = self._sock.recvfrom(1024)
+            _LOG.debug("discarding stale response: %s host:%s port:%s",stale,fromhost,fromport)
+        for msg in msgs:
+            self._sock.sendto(msg,self._addr)
+        responses=[]
+        while len(responses) < len(msgs):
+            if not self._selector.select(timeout_in_seconds):
+                self.commOK=False
+                _LOG.debug("Socket timeout. %ss without response",timeout_in_seconds)
+                raise(NameError('SynscanSocketTimeoutError'))
+            self.commOK=True
+            response,(fromhost,fromport) = self._sock.recvfrom(1024)
+            _LOG.debug("response: %s host:%s port:%s",response,fromhost,fromport)
+            responses.append(response)
+        return responses
+
     def _send_cmd(self,cmd,axis,data=None,ndigits=6):
         '''Command function '''
+        #Keep ordering with previous fire and forget commands
+        self._txQueue.join()
+        return self._exchange(cmd,axis,data,ndigits)
+
+    def _exchange(self,cmd,axis,data=None,ndigits=6):
+        '''Build the frame in the reusable buffer, send it and parse the response'''
+        with self.lock:
+            length=self._build_msg_into(self._txBuf,cmd,axis,data,ndigits)
+            return self._exchange_msg(cmd,axis,data,self._txView[:length])
+
+    def _send_prebuilt_cmd(self,cmd,axis,data,msg):
+        '''Like _send_cmd but for a frame already built with _build_msg(cmd,axis,data)'''
+        self._txQueue.join()
+        with self.lock:
+            return self._exchange_msg(cmd,axis,data,msg)
+
+    def _exchange_msg(self,cmd,axis,data,msg):
+        '''Send the msg frame of cmd and parse the response. Caller must hold self.lock'''
+        if _LOG.isEnabledFor(logging.DEBUG):
+            _LOG.debug('sending cmd:%s',bytes(msg))
+        try:
+            raw_response=self._send_raw_cmd(msg)
+            response=self._parse_response(msg,raw_response)
+        except NameError:
+            self._forget(axis)
+            raise
+        self._remember(cmd,axis,data)
+        return response
+
+    def _already_sent(self,cmd,axis,data):
+        '''True if data is the last value successfully sent, or queued, with
+        cmd to axis and the motor has not been started or stopped since'''
+        return self._lastSent.get((cmd,axis),None)==data
+
+    def _remember(self,cmd,axis,data=None,ndigits=6):
+        '''Track the settings sent to axis after a successful cmd'''
+        if cmd in _REMEMBERED_CMDS:
+            self._lastSent[(cmd,axis)]=data
+        elif cmd=='J' and (self._lastSent.get(('G',axis)) or 0) & _TRACKING_MODE:
+            #Tracking start. Step period and mode stay as sent
+            pass
+        elif cmd in _FORGETTING_CMDS:
+            self._forget(axis)
+
+    def _forget(self,axis):
+        '''Forget every remembered setting of axis'''
+        for cmd in _REMEMBERED_CMDS:
+            self._lastSent.pop((cmd,axis),None)
+
+    def _send_cmd_batch(self,cmds,timeout_in_seconds=2):
+        '''Send several commands in a single flight and return their responses.
+
+        cmds is a list of (cmd,axis[,data[,ndigits]]) tuples. Responses are
+        returned in the same order. With UDP all the datagrams are sent back
+        to back and the replies are collected afterwards, so the whole batch
+        costs about one round trip. Replies carry no command tag, so they are
+        matched to requests by arrival order (index).
+        '''
+        self._txQueue.join()
+        msgs=[self._build_msg(*c) for c in cmds]
+        _LOG.debug('sending batch:%s',msgs)
+        try:
+            responses=self._send_msgs(msgs,timeout_in_seconds)
+        except NameError:
+            for cmd in cmds:
+                self._forget(cmd[1])
+            raise
+        for cmd in cmds:
+            self._remember(*cmd)
+        return responses
+
+    def _send_msgs(self,msgs,timeout_in_seconds=2):
+        '''Send prebuilt msgs, see _send_cmd_batch'''
+        if (self.udp_ip == SERIAL_PORT):
+            #One command at a time. Serial reads are delimited by timeout, not by
+            #frame, and both axes share the same line, so neither pipelining nor
+            #sending each axis from its own thread would overlap anything
+            raw_responses=[self._send_raw_cmd(msg,timeout_in_seconds) for msg in msgs]
+        else:
+            with self.lock:
+                raw_responses=self._udp_exchange(msgs,timeout_in_seconds)
+        return [self._parse_response(msg,raw_response) for msg,raw_response in zip(msgs,raw_responses)]
+
+    def _send_cmd_async(self,cmd,axis,data=None,ndigits=6):
+        '''Queue a command to be sent by the tx thread without waiting for
+        the response. The frame is built here, so invalid data raises to the
+        caller. Transport and motor errors are only logged'''
+        msg=self._build_msg(cmd,axis,data,ndigits)
+        #Remembered now, not when acknowledged, so identical calls made while
+        #this one is pending are elided. A failed send forgets it again
+        self._remember(cmd,axis,data)
+        self._txQueue.put((cmd,axis,data,msg))
+
+    def _tx_loop(self):
+        '''tx thread. Send queued commands in order'''
+        while True:
+            cmd,axis,data,msg=self._txQueue.get()
+            try:
+                with self.lock:
+                    #Not remembered on success: a newer value may be queued
+                    self._parse_response(msg,self._send_raw_cmd(msg))
+            except Exception as error:
+                #Never let the thread die. _txQueue.join() waits on it
+                self._forget(axis)
+                _LOG.warning('Async cmd %s failed: %s',msg,error)
+            finally:
+                self._txQueue.task_done()
+
+    def _build_msg(self,cmd,axis,data=None,ndigits=6):
+        '''Build the raw message for a command'''
+        buf=bytearray(10)
+        length=self._build_msg_into(buf,cmd,axis,data,ndigits)
+        return bytes(buf[:length])
+
+    def _build_msg_into(self,buf,cmd,axis,data=None,ndigits=6):
+        '''Write the raw message for a command into buf. Return its length'''
         if data is None:
            ndigits=0
-        msg=bytes(f':{cmd}{axis}{self._int2hex(data,ndigits)}\r','utf-8')
-        logging.debug(f'sending cmd:{msg}')
-        raw_response=self._send_raw_cmd(msg)
+        assert (ndigits in [0,1,2,4,6]), "ndigits must be one of [0,2,4,6]"
+        pack_into=_FRAME_PACK_INTO[ndigits]
+        cmd=ord(cmd)
+        axis=48+axis        # axis digit
+        if ndigits==0:
+            pack_into(buf,0,58,cmd,axis,13)
+            return 4
+        if cmd in _POSITION_CMDS:
+            data=(data+POSITION_OFFSET) & 0xFFFFFF
+        elif not 0 <= data < 1 << 4*ndigits:
+            _LOG.warning('CMD:%s%s data %s does not fit in %s HEX digits',chr(cmd),axis-48,data,ndigits)
+            raise(NameError('DataOutOfRange'))
+        #Synscan byte order: least significant byte first
+        if ndigits==6:
+            pack_into(buf,0,58,cmd,axis,_HEX2[data & 0xFF],_HEX2[(data >> 8) & 0xFF],_HEX2[(data >> 16) & 0xFF],13)
+        elif ndigits==4:
+            pack_into(buf,0,58,cmd,axis,_HEX2[data & 0xFF],_HEX2[(data >> 8) & 0xFF],13)
+        elif ndigits==2:
+            pack_into(buf,0,58,cmd,axis,_HEX2[data & 0xFF],13)
+        else:
+            pack_into(buf,0,58,cmd,axis,_HEX1[data & 0xF],13)
+        return 4+ndigits
 
+    def _parse_response(self,msg,raw_response):
+        '''Decode a raw response. Raise NameError if the motor reports an error'''
         #If everything is OK first char must be '=' (code 61)
         if raw_response[0]==61:
             response=self._hex2int(raw_response[1:-1])
+            if msg[1] in _POSITION_REPLIES:
+                response-=POSITION_OFFSET
             return response
 
         #If something goes wrong first char must be '!' (code 33)
@@ -119,16 +312,16 @@ class comm:
                        4:'NotInitialized',5:'DriverSleeping',7:'PECTrainingIsRunning',8:'NoValidPECdata'}
             errorNumber=self._hex2int(raw_response[1:-1])
             if errorNumber not in [0,1,2,3,4,5,7,8]:
-                logging.warning(f'Unknown Error {raw_response}')
+                _LOG.warning('Unknown Error %s',raw_response)
                 raise(NameError('CMDUnknowError'))
                 return False                    
             errorStr=ErrorDict[errorNumber]
-            logging.warning(f'CMD:{msg} Error:{errorStr} {raw_response}')
+            _LOG.warning('CMD:%s Error:%s %s',bytes(msg),errorStr,raw_response)
             raise(NameError(errorStr))
             return False
         #Catch the rest
         else:
-            logging.warning(f'Unknown Error {raw_response}')
+            _LOG.warning('Unknown Error %s',raw_response)
             raise(NameError('CMDUnknowError'))
             return False
 
@@ -163,7 +356,7 @@ class comm:
         strHEX=''
         for i in range(length,0,-2):
             strHEX=strHEX+f'{strData[i-2:i]}'
-        logging.debug(f'{data}(decimal) => {strData}(hex) => {strHEX}(synscan hex)')
+        _LOG.debug('%s(decimal) => %s(hex) => %s(synscan hex)',data,strData,strHEX)
         return strHEX
         
     def _hex2int(self,data):
@@ -186,27 +379,27 @@ class comm:
             return ''
         #Status msg only return 12 bits (1.5bytes or 3 hex digits)
         if length==3:
-            logging.debug(f'3bytes response. Not converting to init. Returning as it as string')        
+            _LOG.debug('3bytes response. Not converting to init. Returning as it as string')        
             return strData
         #General case. Returned msd has 1,2,3 bytes (2,4 or 6 hex digits)
-        logging.debug(f'Converting {strData} to a integer')
+        _LOG.debug('Converting %s to a integer',strData)
         strHEX=''
         for i in range(length,0,-2):
             strHEX=strHEX+f'{strData[i-2:i]}'
         v=int(strHEX,16)
-        logging.debug(f'{strData}(synscan hex) => {strHEX}(hex) => {v}(decimal)')
+        _LOG.debug('%s(synscan hex) => %s(hex) => %s(decimal)',strData,strHEX,v)
         return v
 
     def _test_comm(self):
         '''Control msg to check comms'''
         MESSAGE = b":F3\r"
-        logging.info(f"Testing comms. Asking if initialized..")
+        _LOG.info("Testing comms. Asking if initialized..")
         response=self._send_raw_cmd(MESSAGE)
         
         if response == b'=\r':
-            logging.info(f"Mount initialized. Connection OK" )
+            _LOG.info("Mount initialized. Connection OK")
         else:
-            logging.info(f"Mount not initialized. Connection FAIL" )
+            _LOG.info("Mount not initialized. Connection FAIL")
 
 if __name__ == '__main__':
     smc=comm()
@@ -45,10 +45,21 @@
 # https://inter-static.skywatcher.com/downloads/skywatcher_motor_controller_command_set.pdf
 
 import os
+import enum
+import itertools
 import logging
+import queue
+import random
+import threading
 from synscan.comm import comm
 import time
 
+#Optional. Only needed by the vectorized (_arr) conversions
+try:
+    import numpy as np
+except ImportError:
+    np = None
+
 # Modifications for USB serial comms
 SERIAL_PORT = "COM5"
 UDP_IP = SERIAL_PORT
@@ -60,6 +71,62 @@ LOGGING_LEVEL=os.getenv("SYNSCAN_LOGGING_LEVEL",logging.INFO)
 
 LOGGING_LEVEL=os.getenv("SYNSCAN_LOGGING_LEVEL",logging.INFO)
 
+_LOG=logging.getLogger(__name__)
+
+INIT_MAX_RETRIES=int(os.getenv("SYNSCAN_INIT_MAX_RETRIES",10))
+
+STATUS_QUEUE_SIZE=100
+
+STATUS_POLL_FREQ=float(os.getenv("SYNSCAN_STATUS_POLL_FREQ",5))
+
+def _build_status_table():
+    '''Precompute the decoded status for every possible 12 bits status msg'''
+    table=[]
+    for value in range(0x1000):
+        A=(value >> 8) & 0xF
+        B=(value >> 4) & 0xF
+        C=value & 0xF
+        status=dict()
+        status['Tracking']=bool(A & 0x01)
+        status['CCW']=bool((A & 0x02) >> 1)
+        status['FastSpeed']=bool((A & 0x04) >> 2)
+        status['Stopped']=not(B & 0x01)
+        status['Blocked']=bool((B & 0x02) >> 1)
+        status['InitDone']=bool(C & 0x01)
+        status['LevelSwitchOn']=bool((C & 0x02) >> 1)
+        table.append(status)
+    return tuple(table)
+
+_STATUS_TABLE=_build_status_table()
+
+def _build_motion_mode_table():
+    '''Precompute the motion mode value for every (Tracking,fastSpeed,CW)
+    combination. Index is (Tracking<<2)|(fastSpeed<<1)|CW'''
+    table=[]
+    for Tracking,fastSpeed,CW in itertools.product((False,True),repeat=3):
+        #Speed bit meaning is reversed between Tracking and Goto modes
+        speedBit=int(Tracking==fastSpeed)
+        table.append(int(Tracking)*16+speedBit*32+int(CW))
+    return tuple(table)
+
+_MOTION_MODE_TABLE=_build_motion_mode_table()
+
+def _motion_mode_value(Tracking,CW=True,fastSpeed=False):
+    '''Motion mode value. Same arguments as motors.axis_set_motion_mode'''
+    return _MOTION_MODE_TABLE[(bool(Tracking)<<2)|(bool(fastSpeed)<<1)|bool(CW)]
+
+class AxisState(enum.Enum):
+    '''Session state of an axis'''
+    IDLE='Idle'         # Stopped. Motion mode and parameters can be set
+    MOVING='Moving'     # Running. Has to be stopped before a new session
+
+#Session transitions. Configuration commands sent in a single flight for each
+#(state,session): set motion mode, set goto target or step period. "Start" is
+#only sent once all of them have been accepted
+_SESSION_TRANSITIONS={(AxisState.IDLE,'goto'):('G','S'),
+                      (AxisState.IDLE,'track'):('G','I'),
+                      }
+
 class motors(comm):
     '''
     Implementation of motor commands and logic
@@ -93,8 +160,18 @@ class motors(comm):
 
     Generally, the motor controller returns to "Speed Mode" when the motor stops automatically. 
 
+    axis_goto and axis_track follow this session: the axis is stopped if needed and then
+    motion mode and parameter are sent in a single flight and, once both are accepted,
+    "Start" (see AxisState).
+
     **NOTE:** Methods begining with axis prefix act only onto selected axis.
 
+    GOTO completion is watched by a background thread so goto() returns as soon as
+    the motion starts. Use wait_complete() or is_moving() to follow it. Every status
+    update is also published on statusQueue (oldest snapshots are dropped when full).
+
+    start_poller() keeps the current values refreshed from a background thread so
+    get_current_values() can answer from the cache without any UDP round trip.
 
 
     '''
@@ -107,30 +184,49 @@ class motors(comm):
             level=LOGGING_LEVEL
             )
         super(motors, self).__init__(udp_ip,udp_port)
+        #Motion mode has only a few possible values. Build all their frames once
+        self._motionModeFrames={(axis,value):self._build_msg('G',axis,value,ndigits=2)
+                                for axis in (1,2) for value in _MOTION_MODE_TABLE}
+        self._motionDone={1:threading.Event(),2:threading.Event()}
+        for event in self._motionDone.values():
+            event.set()
+        #Motion session id per axis. A new goto/track supersedes the previous
+        #session, so its watcher thread must neither stop the axis nor signal
+        #completion. Held while starting a session or acting on its status
+        self._motionSession={1:0,2:0}
+        self._sessionLock={1:threading.RLock(),2:threading.RLock()}
+        self.statusQueue=queue.Queue(maxsize=STATUS_QUEUE_SIZE)
+        self._poller=None
+        self._pollerStop=threading.Event()
         self._init()
         self.update_current_values()
 
 
-    def _init(self):
-        '''Get main motor parameters. Retry if comm fails'''
+    def _init(self,maxRetries=INIT_MAX_RETRIES):
+        '''Get main motor parameters. Retry with backoff if comm fails.
+        Raise NameError after maxRetries failed attempts'''
         retrySec=2
-        try:
-            self.params=self.get_parameters()
-        except NameError as error:
-            logging.warning(error)
-            logging.warning(f'Retrying in {retrySec}...')
-            time.sleep(retrySec)
-            self._init()
+        for attempt in range(maxRetries):
+            try:
+                self.params=self.get_parameters()
+                return
+            except NameError as error:
+                _LOG.warning(error)
+                if attempt==maxRetries-1:
+                    break
+                #Exponential backoff with jitter, capped to 30s
+                delay=min(retrySec*2**attempt,30)*random.uniform(0.8,1.2)
+                _LOG.warning('Retrying in %.1fs (%s/%s)...',delay,attempt+1,maxRetries)
+                time.sleep(delay)
+        _LOG.error('Unable to get mount parameters after %s attempts',maxRetries)
+        raise(NameError('InitError'))
 
     def _degreesPerSecond2T1preset(self,axis,degreesPerSecond):
         '''Convert degrees per second to T1_preset (StepPeriod)'''
-        countsPerSecond=self.degrees2counts(axis,degreesPerSecond)
-        TMR_Freq=self.params[axis]['TimerInterruptFreq']
-        if abs(countsPerSecond) <=0:
-            T1preset=TMR_Freq
-        else:
-            T1preset=TMR_Freq/abs(countsPerSecond)
-        return T1preset
+        countsPerSecond=abs(degreesPerSecond*self._countsPerDegree[axis])
+        if countsPerSecond <=0:
+            return self._timerFreq[axis]
+        return self._timerFreq[axis]/countsPerSecond
 
 
     def get_values(self,parameterDict):
@@ -141,17 +237,21 @@ class motors(comm):
         Used by get_parameters and update_current_values functions
 
         '''
-        params=dict()
-        for axis in range(1,3):
-            params[axis]=dict()
-            for parameter,cmd in parameterDict.items():
-                try:
-                    params[axis][parameter]=self._send_cmd(cmd,axis)
-                except NameError as error:
-                    logging.warning(error)
-                    raise(NameError('getValuesError'))
+        axes=range(1,3)
+        cmds=[]
+        for axis in axes:
+            cmds.extend((cmd,axis) for cmd in parameterDict.values())
             #Send init done
-            self._send_cmd('F',axis)  # Initialize
+            cmds.append(('F',axis))  # Initialize
+        try:
+            responses=iter(self._send_cmd_batch(cmds))
+        except NameError as error:
+            _LOG.warning(error)
+            raise(NameError('getValuesError'))
+        params=dict()
+        for axis in axes:
+            params[axis]=dict(zip(parameterDict.keys(),responses))
+            next(responses)  # Initialize response
         return params
 
     def get_parameters(self):
@@ -178,10 +278,19 @@ class motors(comm):
         try:
             params=self.get_values(parameterDict)
         except NameError as error:
-            logging.warning(error)
+            _LOG.warning(error)
             raise(NameError('getParametersError'))
             return {}
-        logging.info(f'MOUNT PARAMETERS: {params}')
+        _LOG.info('MOUNT PARAMETERS: %s',params)
+        #Cache conversion factors used on every speed/position conversion
+        self._timerFreq=dict()
+        self._countsPerDegree=dict()
+        self._degreesPerCount=dict()
+        for axis in params:
+            CPR=float(params[axis]['countsPerRevolution'])
+            self._timerFreq[axis]=float(params[axis]['TimerInterruptFreq'])
+            self._countsPerDegree[axis]=CPR/360
+            self._degreesPerCount[axis]=360/CPR if CPR else 0.0
         return params
 
     def axis_get_pos(self,axis):
@@ -192,7 +301,7 @@ class motors(comm):
     def axis_set_pos(self,axis,degrees):
         '''Synchronize position Degrees.'''
         if self.params[axis]['countsPerRevolution']:
-          logging.info(f'AXIS{axis}: Synchronizing actual position to {degrees} degrees')
+          _LOG.info('AXIS%s: Synchronizing actual position to %s degrees',axis,degrees)
           counts=self.degrees2counts(axis,degrees)
           response=self.axis_set_posCounts(axis,int(counts))
 
@@ -227,19 +336,8 @@ class motors(comm):
         * LevelSwitchOn
 
         '''
-        A=int(hexstring[0],16)       
-        B=int(hexstring[1],16)
-        C=int(hexstring[2],16)
-        logging.debug(f'Decode status {hexstring} A:{A} B:{B} C:{C}')
-        status=dict()
-        status['Tracking']=bool(A & 0x01)
-        status['CCW']=bool((A & 0x02) >> 1)
-        status['FastSpeed']=bool((A & 0x04) >> 2)
-        status['Stopped']=not(B & 0x01)
-        status['Blocked']=bool((B & 0x02) >> 1)
-        status['InitDone']=not(C & 0x01)
-        status['LevelSwitchOn']=bool((B & 0x02) >> 1)
-        return status
+        #Copy so callers can modify the returned status
+        return dict(_STATUS_TABLE[int(hexstring,16)])
 
 
     def axis_set_motion_mode(self,axis,Tracking,CW=True,fastSpeed=False):
@@ -266,48 +364,38 @@ class motors(comm):
         '''
         if not self.params[axis]['countsPerRevolution']:
           return None
-        if not Tracking:
-            if fastSpeed:
-                speedBit=0
-            else:
-                speedBit=1
-        else:
-            if fastSpeed:
-                speedBit=1
-            else:
-                speedBit=0
-        if Tracking:
-            value=16
-        else:
-            value=0
-        value=value+speedBit*32+CW
+        value=_motion_mode_value(Tracking,CW,fastSpeed)
+        if self._already_sent('G',axis,value):
+            return ''
         #Send as two HEX digits
-        logging.info(f'AXIS{axis}: Setting Motion Mode: {value} HEX:{value:02X}')
-        response=self._send_cmd('G',axis,value,ndigits=2)   # SetMotionMode
+        _LOG.info('AXIS%s: Setting Motion Mode: %s HEX:%02X',axis,value,value)
+        response=self._send_prebuilt_cmd('G',axis,value,self._motionModeFrames[(axis,value)])   # SetMotionMode
         return response        
 
     def _set_T1_preset(self,axis,value):
         '''Set step period for tracking speed'''
         if not self.params[axis]['countsPerRevolution']:
           return None
-        logging.info(f'AXIS{axis}: Setting step_period to: {value} counts per seconds')
-        response=self._send_cmd('I',axis,value) # SetStepPeriod
-        return response
+        if self._already_sent('I',axis,value):
+            return None
+        _LOG.info('AXIS%s: Setting step_period to: %s counts per seconds',axis,value)
+        #Fire and forget. Sent by the tx thread so tracking loops never block on it
+        self._send_cmd_async('I',axis,value) # SetStepPeriod
 
     def axis_get_posCounts(self,axis):
         '''Get actual position in StepsCounts.'''
-        #Position values are offseting by 0x800000
-        response=self._send_cmd('j',axis)-0x800000  # GetAxisPosition
+        response=self._send_cmd('j',axis)  # GetAxisPosition
         return response
 
     def axis_set_goto_targetCounts(self,axis,targetCounts):
         '''GoTo Target value in StepsCounts. Motors has to be stopped'''
         if not self.params[axis]['countsPerRevolution']:
           return None
+        if self._already_sent('S',axis,targetCounts):
+            return ''
         targetAngle=self.counts2degrees(axis,targetCounts)
-        logging.info(f'AXIS{axis}: Setting goto target to {targetCounts} counts ({targetAngle} deg)')
-        #Position values are offseting by 0x800000
-        response=self._send_cmd('S',axis,targetCounts+0x800000) # SetGotoTarget 
+        _LOG.info('AXIS%s: Setting goto target to %s counts (%s deg)',axis,targetCounts,targetAngle)
+        response=self._send_cmd('S',axis,targetCounts) # SetGotoTarget 
         return response
 
     def axis_set_goto_targetIncrementCounts(self,axis,targetCounts):
@@ -316,89 +404,215 @@ class motors(comm):
         if not self.params[axis]['countsPerRevolution']:
           return None
         targetAngle=self.counts2degrees(axis,targetCounts)
-        logging.info(f'AXIS{axis}: Setting goto target INCREMENT to {targetCounts} counts ({targetAngle} deg)')
-        #Position values are offseting by 0x800000
-        response=self._send_cmd('H',axis,targetCounts+0x800000) # SetGotoTargetIncrement
+        _LOG.info('AXIS%s: Setting goto target INCREMENT to %s counts (%s deg)',axis,targetCounts,targetAngle)
+        response=self._send_cmd('H',axis,targetCounts) # SetGotoTargetIncrement
         #Set Brake Point Increment
         response=self._send_cmd('M',axis,0x000DAC)  # SetBreakPointIncrement
         return response
 
-    def axis_wait2stop(self,axis):    
-        '''Wait for given axis to Stop, or overshoot Target'''
+    def axis_wait2stop(self,axis,session=None):    
+        '''Wait for given axis to Stop, or overshoot Target.
+        If session is given, return as soon as a new motion session starts'''
         if not self.params[axis]['countsPerRevolution']:
           return
-        logging.info(f'AXIS{axis}: Waiting to stop.')
-        self.update_current_values()
+        _LOG.info('AXIS%s: Waiting to stop.',axis)
+        #First read must be fresh: the cache may predate the motion start
+        self.get_current_values(fresh=True)
         CW0 = self.values[axis]['Position'] - self.values[axis]['GotoTarget'] # >0 = CW, <0 = CCW 
+        shortPolls=0
+        speed=None
         while not self.values[axis]['Status']['Stopped']:
-            time.sleep(1)
-            self.update_current_values()
-            # stop axis if the motor has gone too far, not when axis is Tracking, 
-            CW1 = self.values[axis]['Position'] - self.values[axis]['GotoTarget']
-            if not self.values[axis]['Status']['Tracking']:
-              if CW0*CW1 <= 0: # changed sign = overshot, or wrong direction
-                self.axis_stop_motion(axis)
-              if abs(CW1) > abs(CW0):
-                self.axis_stop_motion_hard(axis)
-        logging.info(f'AXIS{axis}: Stopped')
+            #Only a watched GOTO heads for GotoTarget. A stop just decelerates
+            interval,shortPolls=self._wait2stop_interval(axis,shortPolls,session is not None,speed)
+            t0,position0=time.monotonic(),self.values[axis]['Position']
+            time.sleep(interval)
+            self.get_current_values()
+            speed=abs(self.values[axis]['Position']-position0)/(time.monotonic()-t0)
+            with self._sessionLock[axis]:
+              if session is not None and session!=self._motionSession[axis]:
+                _LOG.info('AXIS%s: Motion superseded by a new session',axis)
+                return
+              # stop axis if the motor has gone too far, not when axis is Tracking or already stopped
+              CW1 = self.values[axis]['Position'] - self.values[axis]['GotoTarget']
+              status=self.values[axis]['Status']
+              if not status['Tracking'] and not status['Stopped']:
+                if CW0*CW1 <= 0: # changed sign = overshot, or wrong direction
+                  self.axis_stop_motion(axis)
+                if abs(CW1) > abs(CW0):
+                  self.axis_stop_motion_hard(axis)
+        _LOG.info('AXIS%s: Stopped',axis)
+
+    def _wait2stop_interval(self,axis,shortPolls,goto,speed=None):
+        '''Seconds to sleep before checking again if axis has stopped.
+        For a GOTO the remaining time is estimated from distance and speed,
+        so it sleeps until just before the expected arrival. Then it polls
+        every 0.2s, backing off to the old 1s interval if the axis is slower
+        than estimated. shortPolls counts those polls. speed is the one
+        measured (counts per second) over the previous interval, if any.
+        Return (interval,shortPolls)'''
+        values=self.values[axis]
+        status=values['Status']
+        if status['Tracking'] or not values['StepPeriod']:
+            return 1,0
+        backoff=min(1,0.2*2**shortPolls)
+        if goto:
+            countsPerSecond=self._timerFreq[axis]/values['StepPeriod']
+            if status['FastSpeed']:
+                #Worst case (fastest) speed so the arrival is never overslept
+                countsPerSecond*=self.params[axis]['HighSpeedRatio'] or 1
+            countsPerSecond=max(countsPerSecond,speed or 0)
+            remaining=abs(values['GotoTarget']-values['Position'])/countsPerSecond-0.2
+            if speed is None:
+                #First check after 1s at most, as before: it measures the
+                #actual speed and catches a wrong direction early
+                remaining=min(1,remaining)
+            if remaining>backoff:
+                return remaining,0
+        return backoff,shortPolls+1
+
+    def _new_motion_session(self,axis):
+        '''Supersede the current motion session of axis. Return the new session id.
+        Caller must hold self._sessionLock[axis]'''
+        self._motionSession[axis]+=1
+        #Nobody watches the new session until _watch_motion is called
+        self._motionDone[axis].set()
+        return self._motionSession[axis]
+
+    def _poll_until_stopped(self,axis,session):
+        '''Background thread target. Wait for axis to stop and signal it,
+        unless the session has been superseded meanwhile'''
+        try:
+            self.axis_wait2stop(axis,session)
+        except NameError as error:
+            _LOG.warning('AXIS%s: Lost track of motion: %s',axis,error)
+        finally:
+            with self._sessionLock[axis]:
+                if session==self._motionSession[axis]:
+                    self._motionDone[axis].set()
+
+    def _watch_motion(self,axis,session):
+        '''Launch a background thread watching the given session of axis until it stops'''
+        self._motionDone[axis].clear()
+        watcher=threading.Thread(target=self._poll_until_stopped,args=(axis,session),daemon=True)
+        watcher.start()
+
+    def wait_complete(self,axis=None,timeout=None):
+        '''Wait for the watched motion of axis (both if None) to finish.
+        Return False if timeout (seconds) expires first'''
+        axes=[1,2] if axis is None else [axis]
+        deadline=None if timeout is None else time.monotonic()+timeout
+        for axis in axes:
+            remaining=None if deadline is None else max(0,deadline-time.monotonic())
+            if not self._motionDone[axis].wait(remaining):
+                return False
+        return True
+
+    def is_moving(self,axis=None):
+        '''True while a watched motion of axis (any if None) is in progress'''
+        axes=[1,2] if axis is None else [axis]
+        return any(not self._motionDone[axis].is_set() for axis in axes)
+
+    def _publish_status(self,params):
+        '''Put a status snapshot on statusQueue dropping the oldest one if full'''
+        while True:
+            try:
+                self.statusQueue.put_nowait(params)
+                return
+            except queue.Full:
+                try:
+                    self.statusQueue.get_nowait()
+                except queue.Empty:
+                    pass
 
     def axis_set_posCounts(self,axis,counts):
         '''Synchronize position Counts.'''
         if not self.params[axis]['countsPerRevolution']:
           return None
-        logging.info(f'AXIS{axis}: Synchronizing actual position to {counts} counts')
-        #Position values are offseting by 0x800000
-        response=self._send_cmd('E',axis,counts+0x800000) # SetAxisPosition
+        _LOG.info('AXIS%s: Synchronizing actual position to %s counts',axis,counts)
+        response=self._send_cmd('E',axis,counts) # SetAxisPosition
         return response
 
     def axis_set_goto_target(self,axis,targetDegrees):
         '''GoTo Target value in Degrees. Motors has to be stopped'''
         if not self.params[axis]['countsPerRevolution']:
           return None
-        logging.info(f'AXIS{axis}: Setting goto target to {targetDegrees} degrees')
+        _LOG.info('AXIS%s: Setting goto target to %s degrees',axis,targetDegrees)
         posCounts=self.degrees2counts(axis,targetDegrees)
         response=self.axis_set_goto_targetCounts(axis,int(posCounts))
         return response
 
+    def axis_get_state(self,axis):
+        '''Return the AxisState of axis and its position in counts (single flight)'''
+        status,posCounts=self._send_cmd_batch([('f',axis),('j',axis)])
+        if self._decode_status(status)['Stopped']:
+            return AxisState.IDLE,posCounts
+        return AxisState.MOVING,posCounts
+
+    def _run_session(self,axis,session,state,modeValue,value):
+        '''Configure the session from the observed axis state in a single flight,
+        then start motion. value is the goto target (counts) or step period.
+        Raise NameError (and do not start) if the transition is not allowed
+        or the motor rejects any configuration command'''
+        if (state,session) not in _SESSION_TRANSITIONS:
+            _LOG.warning('AXIS%s: Can not start %s session from state %s',axis,session,state.value)
+            raise(NameError('InvalidSessionTransition'))
+        values={'G':(modeValue,2),'S':(value,6),'I':(value,6)}
+        cmds=[(cmd,axis)+values[cmd] for cmd in _SESSION_TRANSITIONS[(state,session)]]
+        _LOG.info('AXIS%s: Starting %s session mode:%02X value:%s',axis,session,modeValue,value)
+        self._send_cmd_batch(cmds)
+        self._send_cmd('J',axis) # StartMotion
+        return AxisState.MOVING
+
     def axis_goto(self,axis,targetDegrees):
       '''Move given axis to target (goto)'''
       if self.params[axis]['countsPerRevolution']:
-        self.axis_stop_motion(axis)
-        actualPos=self.axis_get_pos(axis)
-        self.axis_set_motion_mode(axis,False,(targetDegrees<actualPos),True)
-        self.axis_set_goto_target(axis,targetDegrees)
-        self.axis_start_motion(axis)
+        with self._sessionLock[axis]:
+          session=self._new_motion_session(axis)
+          state,posCounts=self.axis_get_state(axis)
+          if state is AxisState.MOVING:
+              self.axis_stop_motion(axis)
+              state,posCounts=self.axis_get_state(axis)
+          targetCounts=int(self.degrees2counts(axis,targetDegrees))
+          modeValue=_motion_mode_value(False,(targetCounts<posCounts),True)
+          self._run_session(axis,'goto',state,modeValue,targetCounts)
+          self._watch_motion(axis,session)
 
     def axis_set_speed(self,axis,degreesPerSecond):
         '''Set the tracking speed in degreesPerSecond'''
         if not self.params[axis]['countsPerRevolution']:
           return None
-        logging.info(f'AXIS{axis}: Setting speed to:{degreesPerSecond} degrees per second')
+        _LOG.info('AXIS%s: Setting speed to:%s degrees per second',axis,degreesPerSecond)
         if degreesPerSecond!=0:
             response=self._set_T1_preset(axis,int(self._degreesPerSecond2T1preset(axis,abs(degreesPerSecond))))
         else:
-            logging.info(f'AXIS{axis}: Requested speed==0. Stopping axis')
+            _LOG.info('AXIS%s: Requested speed==0. Stopping axis',axis)
             response=self.axis_stop_motion(axis)
         return response
 
     def axis_track(self,axis,speed):
         #Check if we need to stop axis
         if self.params[axis]['countsPerRevolution']:
+          #Cancel the watcher of any previous goto
+          with self._sessionLock[axis]:
+              self._new_motion_session(axis)
           self.update_current_values(axis)
           stopped=self.values[axis]['Status']['Stopped']
           CW=not self.values[axis]['Status']['CCW']
           tracking=self.values[axis]['Status']['Tracking']
+          state=AxisState.IDLE if stopped else AxisState.MOVING
           if not stopped:
               if not tracking or (CW and (speed <0)) or (not CW and (speed >0)):
-                  logging.info(f'TRACK asked to change dir or mode tracking:{tracking} CW:{CW} speed:{speed}')
+                  _LOG.info('TRACK asked to change dir or mode tracking:%s CW:%s speed:%s',tracking,CW,speed)
                   self.axis_stop_motion(axis,synchronous=True)
-                  self.axis_set_motion_mode(axis,True,(speed <0),False)
-                  self.axis_set_speed(axis,speed)
-                  self.axis_start_motion(axis)
-                  return 
+                  state,posCounts=self.axis_get_state(axis)
               else:
                   self.axis_set_speed(axis,speed)
                   return 
+          if speed!=0:
+              modeValue=_motion_mode_value(True,(speed <0),False)
+              T1preset=int(self._degreesPerSecond2T1preset(axis,abs(speed)))
+              self._run_session(axis,'track',state,modeValue,T1preset)
+              return
           else:
               self.axis_set_motion_mode(axis,True,(speed <0),False)
               self.axis_set_speed(axis,speed)
@@ -410,51 +624,55 @@ class motors(comm):
         if not self.params[axis]['countsPerRevolution']:
           return None
         response=self._send_cmd('J',axis) # StartMotion
-        logging.info(f'AXIS{axis}: Starting motion')
+        _LOG.info('AXIS%s: Starting motion',axis)
         return response
 
     def axis_stop_motion(self,axis,synchronous=True):
         '''Soft stop. If synchronous==True wait to finish'''
         if not self.params[axis]['countsPerRevolution']:
           return None
-        logging.info(f'AXIS{axis}: Stopping')
+        _LOG.info('AXIS%s: Stopping',axis)
         response=self._send_cmd('K',axis) # AxisStop (Not Instant stop), then set to Tracking. 'Ĺ' for hard stop
         if synchronous:
             self.axis_wait2stop(axis)
         else:
-            logging.info(f'AXIS{axis}: Ask to stop. In progress')
+            _LOG.info('AXIS%s: Ask to stop. In progress',axis)
         return response
         
     def axis_stop_motion_hard(self,axis,synchronous=True):
         '''Hard stop. If synchronous==True wait to finish'''
         if not self.params[axis]['countsPerRevolution']:
           return None
-        logging.info(f'AXIS{axis}: Stopping (hard)')
+        _LOG.info('AXIS%s: Stopping (hard)',axis)
         response=self._send_cmd('L',axis) # AxisStop (Instant stop)
         if synchronous:
             self.axis_wait2stop(axis)
         else:
-            logging.info(f'AXIS{axis}: Ask to hard stop. In progress')
+            _LOG.info('AXIS%s: Ask to hard stop. In progress',axis)
         return response
 
     #HIGH LEVEL API (arguments in degrees)
     def degrees2counts(self,axis,degrees):
         '''Return position or speed in counts for a given deg or deg/seconds value'''
-        CPR=self.params[axis]['countsPerRevolution']
-        if CPR:
-            value=degrees*CPR/360
-        else:
-            value=0
-        return value
+        return degrees*self._countsPerDegree[axis]
 
     def counts2degrees(self,axis,counts):
         '''Return position or speed in degrees for a given counts or counts/seconds value'''
-        CPR=self.params[axis]['countsPerRevolution']
-        if CPR:
-            value=counts*360/CPR
-        else:
-            value=0
-        return value
+        return counts*self._degreesPerCount[axis]
+
+    def degrees2counts_arr(self,axis,degrees):
+        '''Vectorized degrees2counts. Return a numpy array for an array like of deg or deg/seconds values.
+        Requires numpy'''
+        if np is None:
+            raise(NameError('NumpyNotAvailable'))
+        return np.multiply(degrees,self._countsPerDegree[axis],dtype=np.float64)
+
+    def counts2degrees_arr(self,axis,counts):
+        '''Vectorized counts2degrees. Return a numpy array for an array like of counts or counts/seconds values.
+        Requires numpy'''
+        if np is None:
+            raise(NameError('NumpyNotAvailable'))
+        return np.multiply(counts,self._degreesPerCount[axis],dtype=np.float64)
 
     def set_switch(self,on):
         '''Switch on/off auxiliary switch'''
@@ -462,7 +680,7 @@ class motors(comm):
             value=1
         else:
             value=0
-        logging.info(f'Auxiliary switch: {on}')
+        _LOG.info('Auxiliary switch: %s',on)
         response=self._send_cmd('O',1,value,ndigits=1)  # SetSwitch
         return response
 
@@ -475,7 +693,7 @@ class motors(comm):
 
     def goto(self,alpha,beta,synchronous=False):
         '''GOTO. alpha,beta in degrees'''
-        logging.info(f'GOTO axis1={alpha} axis2={beta} degrees')
+        _LOG.info('GOTO axis1=%s axis2=%s degrees',alpha,beta)
         angle={}
         angle[1]=alpha
         angle[2]=beta
@@ -489,69 +707,118 @@ class motors(comm):
               self.axis_start_motion(axis)
               '''
         if synchronous:
-            for axis in [1,2]:
-              if self.params[axis]['countsPerRevolution']:
-                self.axis_wait2stop(axis)
+            self.wait_complete()
 
     def track(self,alpha,beta):
         '''GOTO. alpha,beta in degrees per second'''
-        logging.info(f'TRACK speeds axis1={alpha} axis2={beta} degrees per seconds')
+        _LOG.info('TRACK speeds axis1=%s axis2=%s degrees per seconds',alpha,beta)
         if self.params[1]['countsPerRevolution']:
           self.axis_track(1,alpha)
         if self.params[2]['countsPerRevolution']:
           self.axis_track(2,beta)
 
     def update_current_values(self,logaxis=2):
-        '''Update current status and values
+        '''Update current status and values. Retry until the motors answer
         logaxis can be 1,2,3 or None. 1 for only log current values of axis 1... 
         '''
+        retrySec = 2
+        while True:
+            try:
+                params=self._fetch_current_values()
+                break
+            except (NameError,KeyError,TypeError) as error:
+                _LOG.warning(error)
+                _LOG.warning('Retrying in %s...',retrySec)
+                time.sleep(retrySec)
+        if logaxis==3:
+            _LOG.info('%s',params)
+        if logaxis in [1,2] and self.params[logaxis]['countsPerRevolution']:
+            _LOG.info('AXIS%s %s',logaxis,params[logaxis])
+        return params
+
+    def _fetch_current_values(self):
+        '''Single attempt to read current status and values. Store and publish them.
+        Raise NameError if comm fails'''
         parameterDict={ 'GotoTarget':'h', # Inquire Goto Target Position
                         'Position':'j',   # Inquire Position
                         'StepPeriod':'i', # Inquire Step Period 
                         'Status':'f'      # Inquire Status 
                         }
-        retrySec = 2
-        try:
-          params=self.get_values(parameterDict)
-
-          for parameter in ['GotoTarget','Position']:
-              for axis in range(1,3):
-                  #Position values are offseting by 0x800000
-                  params[axis][parameter]=params[axis][parameter]-0x800000
-                  if self.params[axis]['countsPerRevolution']:
-                    params[axis][parameter+'Deg']=params[axis][parameter]*360/self.params[axis]['countsPerRevolution']
-                  else:
-                    params[axis][parameter+'Deg']=0
-          for axis in range(1,3):
-              params[axis]['Status']=self._decode_status(params[axis]['Status'])
-              if not self.params[axis]['countsPerRevolution']:
-                params[axis]['Status']['Blocked']=True
-        except (NameError,KeyError,TypeError) as error:
-            logging.warning(error)
-            logging.warning(f'Retrying in {retrySec}...')
-            time.sleep(retrySec)
-            params = self.update_current_values(logaxis)
+        #"Initialization Done" goes with every poll (same flight) so a power cycled
+        #mount is initialized again without waiting for a comm failure
+        params=self.get_values(parameterDict)
 
+        #Position values arrive already without the 0x800000 offset
+        for axis in range(1,3):
+            params[axis]['GotoTargetDeg']=self.counts2degrees(axis,params[axis]['GotoTarget'])
+            params[axis]['PositionDeg']=self.counts2degrees(axis,params[axis]['Position'])
+            params[axis]['Status']=self._decode_status(params[axis]['Status'])
+            if not self.params[axis]['countsPerRevolution']:
+              params[axis]['Status']['Blocked']=True
+            #A stopped axis may have reset its settings by itself (goto
+            #arrival, power cycle). Do not skip the next writes to it
+            if params[axis]['Status']['Stopped']:
+              self._forget(axis)
         self.values=params
-        if logaxis==3:
-            logging.info(f'{params}')
-        if logaxis in [1,2] and self.params[logaxis]['countsPerRevolution']:
-            logging.info(f'AXIS{logaxis} {params[logaxis]}')
+        self._publish_status(params)
         return params
 
+    def get_current_values(self,fresh=False):
+        '''Return current status and values.
+        If the poller is running the last polled values are returned without
+        querying the motors, unless fresh==True'''
+        if fresh or not self.is_polling():
+            return self.update_current_values(logaxis=None)
+        return self.values
+
+    def start_poller(self,frequency=STATUS_POLL_FREQ):
+        '''Start a background thread refreshing current values frequency times per second'''
+        if self.is_polling():
+            return
+        self._pollerStop.clear()
+        self._poller=threading.Thread(target=self._poll_loop,args=(1/frequency,),daemon=True)
+        self._poller.start()
+
+    def stop_poller(self):
+        '''Stop the background poller'''
+        if not self.is_polling():
+            return
+        self._pollerStop.set()
+        self._poller.join()
+        self._poller=None
+
+    def is_polling(self):
+        '''True if the background poller is running'''
+        return self._poller is not None and self._poller.is_alive()
+
+    def _poll_loop(self,period):
+        '''Poller thread. _fetch_current_values swaps self.values atomically.
+        Comm failures are logged and retried on the next period, so stop_poller
+        never waits longer than one exchange'''
+        while not self._pollerStop.is_set():
+            t0=time.monotonic()
+            try:
+                self._fetch_current_values()
+            except (NameError,KeyError,TypeError) as error:
+                _LOG.warning('Poller: %s',error)
+            self._pollerStop.wait(max(0,period-(time.monotonic()-t0)))
+
     #Methods for developing
     def _test_goto(self,axis=2,X=90):
         '''Test GOTO. X in degrees'''
-        logging.info(f'AXIS{axis}: GOTO test')
+        _LOG.info('AXIS%s: GOTO test',axis)
+        with self._sessionLock[axis]:
+            session=self._new_motion_session(axis)
         self.axis_stop_motion(axis)
         self.axis_set_motion_mode(axis,False,X,False)
         self.axis_set_goto_target(axis,X)
         self.axis_start_motion(axis)
-        self.axis_wait2stop(axis)
+        self._watch_motion(axis,session)
+        self.wait_complete(axis)
 
     def _test_slew(self,axis=1,speed=1):
         '''Test SLEW'''
-        logging.info(f'AXIS{axis}: SLEW test')
+        _LOG.info('AXIS%s: SLEW test',axis)
         self.axis_stop_motion(axis)
         self.axis_set_motion_mode(axis,True,(speed>=0),True)
         self.axis_set_speed(axis,speed)
@@ -0,0 +1,10 @@
+# -*- coding: iso-8859-15 -*-
+#
+# pysynscan
+# Copyright (c) July 2020 Nacho Mas
+
+import os
+import sys
+
+#Make fakemount importable from the tests
+sys.path.insert(0,os.path.dirname(__file__))
@@ -0,0 +1,134 @@
+# -*- coding: iso-8859-15 -*-
+#
+# pysynscan
+# Copyright (c) July 2020 Nacho Mas
+
+import socket
+import threading
+import time
+
+CPR=360000          # counts per revolution. 1000 counts per degree
+TMR_FREQ=64000      # timer interrupt frequency
+GOTO_RATE=5000      # goto speed in counts per second
+
+
+def _encode(value,ndigits=6):
+    strData=f'{value:0{ndigits}X}'
+    return ''.join(strData[i-2:i] for i in range(ndigits,0,-2))
+
+def _decode(strData):
+    if len(strData)==1:
+        return int(strData,16)
+    return int(''.join(strData[i-2:i] for i in range(len(strData),0,-2)),16)
+
+
+class FakeAxis:
+    '''Minimal simulation of one motor axis'''
+    def __init__(self):
+        self.position=0x800000
+        self.target=0x800000
+        self.stepPeriod=100
+        self.mode=0x10
+        self.running=False
+        self.initDone=False
+        self._t0=0
+        self._p0=0
+
+    def update(self):
+        if not self.running:
+            return
+        now=time.monotonic()
+        if self.mode & 0x10:
+            #Tracking. Move for ever at the step period speed
+            step=int((now-self._t0)*TMR_FREQ/self.stepPeriod)
+            self.position=self._p0+(-step if self.mode & 0x01 else step)
+            return
+        travel=int((now-self._t0)*GOTO_RATE)
+        distance=self.target-self._p0
+        if travel>=abs(distance):
+            self.position=self.target
+            self.running=False
+        else:
+            self.position=self._p0+(travel if distance>0 else -travel)
+
+    def start(self):
+        self.running=True
+        self._t0=time.monotonic()
+        self._p0=self.position
+
+    def status(self):
+        A=(1 if self.mode & 0x10 else 0) | (2 if self.mode & 0x01 else 0)
+        B=1 if self.running else 0
+        C=1 if self.initDone else 0
+        return f'{A:X}{B:X}{C:X}'
+
+
+class FakeMount:
+    '''UDP Synscan motor controller simulation. Records every received frame in log.
+    reject maps a frame (str) to the error code returned for it. delay is
+    the reply latency in seconds'''
+    def __init__(self):
+        self._sock=socket.socket(socket.AF_INET,socket.SOCK_DGRAM)
+        self._sock.bind(('127.0.0.1',0))
+        self.ip,self.port=self._sock.getsockname()
+        self.axes={1:FakeAxis(),2:FakeAxis()}
+        self.log=[]
+        self.reject={}
+        self.online=True
+        self.delay=0
+        self._lock=threading.Lock()
+        threading.Thread(target=self._run,daemon=True).start()
+
+    def frames(self,prefix=''):
+        return [frame for frame in self.log if frame.startswith(prefix)]
+
+    def power_cycle(self):
+        with self._lock:
+            self.axes={1:FakeAxis(),2:FakeAxis()}
+
+    def _run(self):
+        while True:
+            data,addr=self._sock.recvfrom(64)
+            frame=data.decode()
+            with self._lock:
+                self.log.append(frame)
+                if not self.online:
+                    continue
+                if frame in self.reject:
+                    response=f'!{self.reject[frame]:X}'
+                else:
+                    response='='+self._handle(frame)
+            if self.delay:
+                time.sleep(self.delay)
+            self._sock.sendto((response+'\r').encode(),addr)
+
+    def _handle(self,frame):
+        cmd=frame[1]
+        axis=self.axes[int(frame[2])]
+        data=frame[3:-1]
+        axis.update()
+        replies={'a':lambda:_encode(CPR),
+                 'b':lambda:_encode(TMR_FREQ),
+                 'e':lambda:_encode(0x030F02),
+                 'g':lambda:_encode(16,2),
+                 'i':lambda:_encode(axis.stepPeriod),
+                 'j':lambda:_encode(axis.position),
+                 'h':lambda:_encode(axis.target),
+                 'f':axis.status}
+        if cmd in replies:
+            return replies[cmd]()
+        if cmd=='F':
+            axis.initDone=True
+        elif cmd=='G':
+            axis.mode=_decode(data)
+        elif cmd=='I':
+            axis.stepPeriod=_decode(data)
+        elif cmd=='S':
+            axis.target=_decode(data)
+        elif cmd=='E':
+            axis.position=_decode(data)
+        elif cmd=='J':
+            axis.start()
+        elif cmd in 'KL':
+            axis.running=False
+        return ''
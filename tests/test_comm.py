@@ -0,0 +1,30 @@
+# -*- coding: iso-8859-15 -*-
+#
+# pysynscan
+# Copyright (c) July 2020 Nacho Mas
+
+import pytest
+
+from synscan.comm import comm
+
+
+@pytest.fixture
+def smc():
+    #Frame building does not need a connection
+    return comm.__new__(comm)
+
+
+def test_build_msg(smc):
+    assert smc._build_msg('F',1) == b':F1\r'
+    assert smc._build_msg('I',2,0x123456) == b':I2563412\r'
+    assert smc._build_msg('G',1,0x30,ndigits=2) == b':G130\r'
+    assert smc._build_msg('O',1,1,ndigits=1) == b':O11\r'
+
+def test_build_msg_position_offset(smc):
+    assert smc._build_msg('S',1,0) == b':S1000080\r'
+    assert smc._build_msg('E',1,-1) == b':E1FFFF7F\r'
+
+@pytest.mark.parametrize('data,ndigits',[(0x1000000,6),(-1,6),(0x100,2),(0x10,1)])
+def test_build_msg_data_out_of_range(smc,data,ndigits):
+    with pytest.raises(NameError):
+        smc._build_msg('I',1,data,ndigits)
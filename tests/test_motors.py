@@ -0,0 +1,117 @@
+# -*- coding: iso-8859-15 -*-
+#
+# pysynscan
+# Copyright (c) July 2020 Nacho Mas
+
+import time
+
+import pytest
+
+import synscan
+from synscan.motors import AxisState,_STATUS_TABLE
+from fakemount import FakeMount
+
+
+@pytest.fixture
+def mount():
+    return FakeMount()
+
+@pytest.fixture
+def smc(mount):
+    return synscan.motors(mount.ip,mount.port)
+
+
+@pytest.mark.parametrize('status,key,expected',[
+    ('000','InitDone',False),('001','InitDone',True),
+    ('000','LevelSwitchOn',False),('002','LevelSwitchOn',True),
+    ('003','InitDone',True),('003','LevelSwitchOn',True),
+    ('100','Tracking',True),('200','CCW',True),('400','FastSpeed',True),
+    ('000','Stopped',True),('010','Stopped',False),('020','Blocked',True)])
+def test_status_table(status,key,expected):
+    assert _STATUS_TABLE[int(status,16)][key] is expected
+
+def test_init_done_after_status_poll(mount,smc):
+    assert smc.update_current_values(logaxis=None)[1]['Status']['InitDone']
+
+def test_goto_waits_until_target(mount,smc):
+    smc.goto(2,-1,synchronous=True)
+    assert smc.axis_get_pos(1) == pytest.approx(2,abs=0.01)
+    assert smc.axis_get_pos(2) == pytest.approx(-1,abs=0.01)
+    assert not smc.is_moving()
+
+def test_new_goto_supersedes_previous_watcher(mount,smc):
+    smc.goto(10,0)
+    time.sleep(0.5)
+    smc.goto(-5,0,synchronous=True)
+    assert smc.axis_get_pos(1) == pytest.approx(-5,abs=0.01)
+    #Only the stop issued by the second goto itself
+    assert mount.frames(':K1') == [':K1\r']
+
+def test_goto_not_started_if_configuration_rejected(mount,smc):
+    mount.reject[':G100\r']=2   # MotorNotStopped
+    n=len(mount.log)
+    with pytest.raises(NameError):
+        smc.axis_goto(1,10)
+    assert ':J1\r' not in mount.log[n:]
+    assert not mount.axes[1].running
+
+def test_session_not_started_from_moving_state(mount,smc):
+    n=len(mount.log)
+    with pytest.raises(NameError):
+        smc._run_session(1,'goto',AxisState.MOVING,0,100)
+    assert mount.log[n:] == []
+
+def test_stop_poller_while_mount_unreachable(mount,smc):
+    smc.start_poller(frequency=20)
+    time.sleep(0.2)
+    mount.online=False
+    time.sleep(0.5)
+    t0=time.monotonic()
+    smc.stop_poller()
+    #At most one pending exchange (2s timeout)
+    assert time.monotonic()-t0 < 3
+    assert not smc.is_polling()
+
+def test_power_cycled_mount_is_initialized_again(mount,smc):
+    mount.power_cycle()
+    assert not mount.axes[1].initDone
+    smc.update_current_values(logaxis=None)
+    assert mount.axes[1].initDone and mount.axes[2].initDone
+
+def test_repeated_track_does_not_resend_step_period(mount,smc):
+    for _ in range(3):
+        smc.axis_track(1,0.5)
+    smc._txQueue.join()
+    assert len(mount.frames(':I1')) == 1
+    smc.axis_track(1,0.25)
+    smc._txQueue.join()
+    assert len(mount.frames(':I1')) == 2
+
+def test_tx_thread_survives_transport_error(mount,smc):
+    exchange=smc._udp_exchange
+    def fail_once(*args):
+        smc._udp_exchange=exchange
+        raise OSError('Network is unreachable')
+    smc._udp_exchange=fail_once
+    smc.axis_set_speed(1,0.3)
+    smc._txQueue.join()
+    assert smc._tx.is_alive()
+    assert smc.axis_get_pos(1) == pytest.approx(0,abs=0.01)
+    #Nothing remembered from the failed write
+    smc.axis_set_speed(1,0.3)
+    smc._txQueue.join()
+    assert len(mount.frames(':I1')) == 1
+
+def test_out_of_range_speed_raises_to_caller(mount,smc):
+    #Step period far beyond 6 HEX digits
+    with pytest.raises(NameError):
+        smc.axis_set_speed(1,1e-6)
+    smc._txQueue.join()
+    assert mount.frames(':I1') == []
+
+def test_identical_speeds_elided_while_write_pending(mount,smc):
+    mount.delay=0.02
+    for _ in range(200):
+        smc.axis_set_speed(1,0.3)
+    smc._txQueue.join()
+    assert len(mount.frames(':I1')) == 1